@@ -1,15 +1,60 @@
 import os
+import re
+import hmac
+import time
+import atexit
+import queue
 import logging
+import logging.handlers
 from datetime import datetime, date
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import Flask, render_template, stream_template, request, redirect, url_for, flash, make_response, get_flashed_messages
+from jinja2 import FileSystemBytecodeCache
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.middleware.proxy_fix import ProxyFix
-from sqlalchemy import func, extract, or_, and_
-from models import db, User, Project, TimeEntry
+from sqlalchemy import func, extract, or_, and_, case
+from sqlalchemy.orm import Load, Session, joinedload, selectinload
+from sqlalchemy.pool import NullPool
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, User, Project, TimeEntry, gevent_patched
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+class NativeQueueListener(logging.handlers.QueueListener):
+    """QueueListener whose writer stays a real OS thread under gevent.
+
+    Once gevent has patched threading, a plain QueueListener thread is a greenlet
+    on the worker's hub and its blocking stderr writes stall every request; the
+    listener then runs on a dedicated one-thread native pool instead.
+    """
+    
+    def start(self):
+        if not gevent_patched():
+            return super().start()
+        from gevent.threadpool import ThreadPool
+        self._pool = ThreadPool(1)
+        self._thread = self._pool.spawn(self._monitor)
+    
+    def stop(self):
+        if not gevent_patched():
+            return super().stop()
+        if self._thread:
+            self.enqueue_sentinel()
+            self._thread.wait()
+            self._thread = None
+            self._pool.kill()
+
+def _log_queue():
+    """Unbounded queue usable across native threads, even once gevent has patched `queue`"""
+    if gevent_patched():
+        from gevent import monkey
+        return monkey.get_original('queue', 'SimpleQueue')()
+    return queue.SimpleQueue()
+
+# Configure logging: request threads only enqueue records, a listener thread writes them
+log_queue = _log_queue()
+logging.basicConfig(level=logging.DEBUG, handlers=[logging.handlers.QueueHandler(log_queue)])
+log_listener = NativeQueueListener(log_queue, logging.StreamHandler(), respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
 logger = logging.getLogger(__name__)
 
 # Create Flask app
@@ -17,13 +62,50 @@ app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev_secret_key_change_in_production")
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
+# Cache du bytecode des templates Jinja partagé entre workers et redémarrages ;
+# par défaut, répertoire privé de Jinja (par utilisateur, mode 0700, propriétaire vérifié)
+jinja_cache_dir = os.environ.get("JINJA_CACHE_DIR")
+if jinja_cache_dir:
+    os.makedirs(jinja_cache_dir, mode=0o700, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(jinja_cache_dir)
+else:
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+
 # Database configuration
 app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    'pool_pre_ping': True,
-    "pool_recycle": 300,
-}
+if os.environ.get("DB_NULLPOOL", "").lower() in ("1", "true", "yes"):
+    # Instances éphémères (autoscale/serverless) : pas de connexions inactives conservées
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "poolclass": NullPool,
+        "query_cache_size": 1200,
+    }
+else:
+    # Taille du pool à aligner sur le nombre de threads/greenlets par worker
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        'pool_pre_ping': True,
+        "pool_recycle": 300,
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 20)),
+        "pool_timeout": 30,
+        "query_cache_size": 1200,
+    }
+# Lever une erreur sur tout chargement paresseux non prévu (développement/tests)
+app.config["STRICT_LAZY"] = os.environ.get("STRICT_LAZY", "").lower() in ("1", "true", "yes")
+# Durée de vie (secondes) du cache des données de référence (projets, utilisateurs)
+app.config["REFERENCE_CACHE_TIMEOUT"] = int(os.environ.get("REFERENCE_CACHE_TIMEOUT", 60))
+# Durée de vie (secondes) des totaux de pagination mis en cache
+app.config["COUNT_CACHE_TIMEOUT"] = int(os.environ.get("COUNT_CACHE_TIMEOUT", 30))
+# Nombre maximal de changements de mot de passe (hash argon2) par utilisateur et par minute
+app.config["PASSWORD_ATTEMPTS_PER_MINUTE"] = int(os.environ.get("PASSWORD_ATTEMPTS_PER_MINUTE", 5))
+
+# Sessions côté serveur (Redis) si REDIS_URL est défini, sinon cookie signé Flask
+if os.environ.get("REDIS_URL"):
+    import redis
+    from flask_session import Session as ServerSession
+    app.config["SESSION_TYPE"] = "redis"
+    app.config["SESSION_REDIS"] = redis.from_url(os.environ["REDIS_URL"])
+    ServerSession(app)
 
 # Initialize extensions
 db.init_app(app)
@@ -33,45 +115,224 @@ login_manager.login_view = 'login'
 login_manager.login_message = 'Veuillez vous connecter pour accéder à cette page.'
 login_manager.login_message_category = 'info'
 
+def eager_options(entity, *loaders):
+    """Options de chargement des relations de `entity`.
+
+    En mode STRICT_LAZY, toute autre relation de `entity` est en raiseload('*')
+    afin qu'un accès paresseux oublié (N+1) lève une erreur au lieu d'une requête.
+    """
+    if app.config.get("STRICT_LAZY"):
+        return (*loaders, Load(entity).raiseload('*'))
+    return loaders
+
+# Cache en mémoire (par processus) des données de référence qui changent rarement
+_reference_cache = {}
+
+def cached_reference(key, loader, refresh=False):
+    """Retourner la valeur en cache pour `key`, ou la charger via `loader(session)`.
+
+    Le chargement se fait dans une session dédiée, fermée aussitôt : les objets
+    mis en cache sont détachés et ne doivent être utilisés qu'en lecture.
+    Le cache est propre à chaque worker : `refresh=True` force le rechargement
+    (pages d'administration, qui doivent refléter les modifications faites ailleurs).
+    """
+    now = time.monotonic()
+    cached = _reference_cache.get(key)
+    if cached and cached[0] > now and not refresh:
+        return cached[1]
+    with Session(db.engine) as session:
+        value = loader(session)
+    _reference_cache[key] = (now + app.config["REFERENCE_CACHE_TIMEOUT"], value)
+    return value
+
+def invalidate_reference_cache():
+    """Vider le cache des données de référence après une modification"""
+    _reference_cache.clear()
+
+def get_all_projects(refresh=False):
+    """Liste de tous les projets (avec leur créateur), mise en cache"""
+    return cached_reference('projects', lambda session: session.scalars(
+        db.select(Project).options(joinedload(Project.creator))
+    ).all(), refresh)
+
+def get_all_users(refresh=False):
+    """Liste de tous les utilisateurs, mise en cache"""
+    return cached_reference('users', lambda session: session.scalars(db.select(User)).all(), refresh)
+
+# Totaux de pagination (COUNT) mis en cache par filtre, vidés à chaque modification d'entrée
+_count_cache = {}
+
+def cached_entry_count(key, query):
+    """Nombre d'entrées de `query`, mis en cache quelques secondes pour la clé `key`"""
+    now = time.monotonic()
+    cached = _count_cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+    total = query.order_by(None).with_entities(func.count(TimeEntry.id)).scalar()
+    if len(_count_cache) >= 1000:  # borne la mémoire (termes de recherche distincts)
+        _count_cache.clear()
+    _count_cache[key] = (now + app.config["COUNT_CACHE_TIMEOUT"], total)
+    return total
+
+def invalidate_entry_counts():
+    """Vider les totaux de pagination après un ajout, une modification ou une suppression"""
+    _count_cache.clear()
+
+# Horodatages des tentatives de changement de mot de passe par clé (fenêtre d'une minute)
+_password_attempts = {}
+
+def password_attempt_allowed(key):
+    """Enregistrer une tentative pour `key` ; False si la limite par minute est atteinte.
+
+    Borne le nombre de calculs de hash coûteux qu'un même compte peut déclencher.
+    """
+    now = time.monotonic()
+    attempts = [t for t in _password_attempts.get(key, ()) if t > now - 60]
+    allowed = len(attempts) < app.config["PASSWORD_ATTEMPTS_PER_MINUTE"]
+    if allowed:
+        attempts.append(now)
+    _password_attempts[key] = attempts
+    return allowed
+
+def passwords_match(password, confirmation):
+    """Comparer un mot de passe et sa confirmation en temps constant"""
+    return hmac.compare_digest(password.encode(), confirmation.encode())
+
+def upsert_insert(model):
+    """INSERT supportant ON CONFLICT (PostgreSQL en production, SQLite en développement)"""
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return sqlite_insert(model)
+    return pg_insert(model)
+
+def get_user_by_username(username):
+    """Utilisateur par nom (colonne unique et indexée), ou None"""
+    return db.session.execute(
+        db.select(User).where(User.username == username)
+    ).scalar_one_or_none()
+
+def conditional_response(body):
+    """Réponse HTML avec ETag : 304 si le navigateur possède déjà cette version"""
+    response = make_response(body)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
+
+def stream_page(template_name, **context):
+    """Rendre `template_name` en flux : les premiers octets partent avant la fin du rendu.
+
+    Les messages flash sont lus avant l'envoi des en-têtes afin que leur retrait
+    de la session soit bien enregistré dans le cookie de réponse.
+    Une erreur levée pendant le rendu survient après l'envoi du statut 200 : la page
+    est tronquée et un `except` de la route ne l'intercepte pas. À réserver aux pages
+    sans gestion d'erreur propre.
+    """
+    get_flashed_messages(with_categories=True)
+    return stream_template(template_name, **context)
+
+# Valeur d'un champ <input type="month"> : "AAAA-MM"
+_MONTH_YEAR_RE = re.compile(r'([0-9]{4})-(0[1-9]|1[0-2])')
+
+def parse_month_year(month_year):
+    """Retourner (année, mois) pour une valeur "AAAA-MM", ou None si elle est invalide"""
+    match = _MONTH_YEAR_RE.fullmatch(month_year)
+    if not match:
+        return None
+    return int(match[1]), int(match[2])
+
+def month_range(today, n=12):
+    """Les `n` derniers mois jusqu'à celui de `today` inclus, du plus ancien au plus récent.
+
+    Retourne des tuples (année, mois, 'MM/AAAA').
+    """
+    months = []
+    year, month = today.year, today.month
+    for _ in range(n):
+        months.append((year, month, f"{month:02d}/{year}"))
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    months.reverse()
+    return months
+
+def project_month_stats(months, *filters):
+    """Statistiques par projet en une seule requête : couleur, total d'heures, nombre
+    d'entrées et une colonne d'heures `m<i>` par mois de `months` (agrégation conditionnelle).
+
+    Volontairement sans borne sur (année, mois) : les totaux portent sur tout l'historique,
+    la fenêtre de `months` ne s'applique qu'aux colonnes mensuelles.
+    """
+    month_columns = [
+        func.coalesce(func.sum(case(
+            (and_(TimeEntry.year == year, TimeEntry.month == month), TimeEntry.hours)
+        )), 0).label(f'm{idx}')
+        for idx, (year, month, _) in enumerate(months)
+    ]
+    return db.session.query(
+        Project.name.label('project_name'),
+        Project.color.label('project_color'),
+        func.sum(TimeEntry.hours).label('total_hours'),
+        func.count(TimeEntry.id).label('entry_count'),
+        *month_columns
+    ).join(TimeEntry).filter(*filters).group_by(Project.id, Project.name, Project.color).all()
+
+def monthly_percentages(project_stats, months):
+    """Part (en %) de chaque projet dans le total d'heures de chaque mois de `months`.
+
+    `project_stats` provient de `project_month_stats` ; les mois sans heures valent 0.
+    """
+    monthly_hours = {
+        stat.project_name: [float(getattr(stat, f'm{idx}')) for idx in range(len(months))]
+        for stat in project_stats
+    }
+    monthly_totals = [sum(column) for column in zip(*monthly_hours.values())]
+    
+    for project_hours in monthly_hours.values():
+        for month_idx, total in enumerate(monthly_totals):
+            project_hours[month_idx] = round(project_hours[month_idx] / total * 100, 1) if total > 0 else 0
+    return monthly_hours
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return db.session.get(User, int(user_id))
+
+def init_database(fast_hash=False):
+    """Initialize database with tables and default users.
 
-def init_database():
-    """Initialize database with tables and default users"""
+    fast_hash=True seeds the default accounts with minimal-cost argon2 hashes,
+    upgraded on first login (local development server only).
+    """
     with app.app_context():
+        if db.engine.dialect.name == 'postgresql':
+            # Required by the trigram index on time_entries.notes
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql('CREATE EXTENSION IF NOT EXISTS pg_trgm')
         db.create_all()
-        
-        # Check if users already exist
-        if User.query.count() == 0:
-            # Create default users
-            admin_user = User()
-            admin_user.username = 'fgillet'
-            admin_user.is_admin = True
-            admin_user.set_password('fgillet')
-            
-            regular_user = User()
-            regular_user.username = 'htepa'
-            regular_user.is_admin = False
-            regular_user.set_password('htepa')
-            
-            db.session.add(admin_user)
-            db.session.add(regular_user)
-            db.session.flush()  # Flush to get the IDs
+        # create_all skips existing tables: add indexes missing from older databases
+        for index in TimeEntry.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+        
+        # Check if users already exist (existence only, no COUNT(*))
+        if db.session.query(User.id).first() is None:
+            # Create default users (bulk insert, no per-object flush)
+            db.session.bulk_insert_mappings(User, [
+                {'username': 'fgillet', 'is_admin': True, 'password_hash': User.hash_password('fgillet', fast=fast_hash)},
+                {'username': 'htepa', 'is_admin': False, 'password_hash': User.hash_password('htepa', fast=fast_hash)},
+            ])
+            admin_id = db.session.query(User.id).filter_by(username='fgillet').scalar()
             
             # Create default projects
-            project1 = Project()
-            project1.name = 'Développement Site Web'
-            project1.description = 'Développement frontend et backend du site web de l\'entreprise'
-            project1.created_by_id = admin_user.id
-            
-            project2 = Project()
-            project2.name = 'Application Mobile'
-            project2.description = 'Développement de l\'application mobile iOS et Android'
-            project2.created_by_id = admin_user.id
-            
-            db.session.add(project1)
-            db.session.add(project2)
+            db.session.bulk_insert_mappings(Project, [
+                {
+                    'name': 'Développement Site Web',
+                    'description': 'Développement frontend et backend du site web de l\'entreprise',
+                    'created_by_id': admin_id,
+                },
+                {
+                    'name': 'Application Mobile',
+                    'description': 'Développement de l\'application mobile iOS et Android',
+                    'created_by_id': admin_id,
+                },
+            ])
             
             try:
                 db.session.commit()
@@ -80,8 +341,10 @@ def init_database():
                 logger.error(f"Erreur lors de l'initialisation de la base de données: {str(e)}")
                 db.session.rollback()
 
-# Initialize database
-init_database()
+@app.cli.command('init-db')
+def init_db_command():
+    """Create tables and default data (run once per deploy: flask --app main init-db)"""
+    init_database(fast_hash=False)
 
 @app.route('/')
 def index():
@@ -90,6 +353,11 @@ def index():
         return redirect(url_for('dashboard'))
     return redirect(url_for('login'))
 
+@app.route('/healthz')
+def healthz():
+    """Sonde de santé (Docker) : réponse vide, sans rendu de template ni session"""
+    return '', 200
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     """Page de connexion"""
@@ -104,9 +372,11 @@ def login():
             flash('Veuillez entrer un nom d\'utilisateur et un mot de passe.', 'error')
             return render_template('login.html')
         
-        user = User.query.filter_by(username=username).first()
+        user = get_user_by_username(username)
         
         if user and user.check_password(password):
+            if db.session.is_modified(user):
+                db.session.commit()  # Hash mis à niveau vers argon2id
             login_user(user)
             logger.info(f"Utilisateur connecté: {user.username}")
             flash(f'Bienvenue, {user.username} !', 'success')
@@ -131,24 +401,21 @@ def logout():
 @login_required
 def dashboard():
     """Tableau de bord principal"""
-    projects = Project.query.all()
-    user_time_entries = TimeEntry.query.filter_by(user_id=current_user.id).order_by(TimeEntry.created_at.desc()).limit(10).all()
+    projects = get_all_projects()
+    user_time_entries = TimeEntry.query.options(
+        *eager_options(TimeEntry, joinedload(TimeEntry.project))
+    ).filter_by(user_id=current_user.id).order_by(TimeEntry.created_at.desc()).limit(10).all()
     
-    # Calculate total hours per project for current user
-    project_hours = {}
-    all_user_entries = TimeEntry.query.filter_by(user_id=current_user.id).all()
-    for entry in all_user_entries:
-        project_id = entry.project_id
-        hours = entry.hours
-        if project_id in project_hours:
-            project_hours[project_id] += hours
-        else:
-            project_hours[project_id] = hours
+    # Calculate total hours per project for current user (aggregated in SQL)
+    project_hours = dict(db.session.query(
+        TimeEntry.project_id,
+        func.sum(TimeEntry.hours)
+    ).filter(TimeEntry.user_id == current_user.id).group_by(TimeEntry.project_id).all())
     
-    return render_template('dashboard.html', 
+    return conditional_response(render_template('dashboard.html', 
                          projects=projects, 
                          project_hours=project_hours,
-                         user_time_entries=user_time_entries)
+                         user_time_entries=user_time_entries))
 
 @app.route('/log_time', methods=['POST'])
 @login_required
@@ -165,24 +432,19 @@ def log_time():
         notes = request.form.get('notes', '')
         
         # Validate input - hours can be more than 24 now
-        if not project_id or hours <= 0 or not month_year:
+        if hours <= 0 or not month_year:
             flash('Veuillez fournir un projet, des heures (> 0) et un mois valides.', 'error')
             return redirect(url_for('dashboard'))
         
         # Parse month and year
-        try:
-            year_str, month_str = month_year.split('-')
-            year = int(year_str)
-            month = int(month_str)
-            if month < 1 or month > 12:
-                raise ValueError("Mois invalide")
-        except (ValueError, IndexError):
+        parsed = parse_month_year(month_year)
+        if parsed is None:
             flash('Format de mois invalide.', 'error')
             return redirect(url_for('dashboard'))
+        year, month = parsed
         
-        # Check if project exists
-        project = Project.query.get(project_id)
-        if not project:
+        # Check if project exists (id only, no need to load the full row)
+        if db.session.query(Project.id).filter_by(id=project_id).first() is None:
             flash('Projet sélectionné invalide.', 'error')
             return redirect(url_for('dashboard'))
         
@@ -198,6 +460,7 @@ def log_time():
         
         db.session.add(time_entry)
         db.session.commit()
+        invalidate_entry_counts()
         
         # Success message showing the month
         month_display = time_entry.get_display_month()
@@ -220,14 +483,29 @@ def admin():
         flash('Accès refusé. Privilèges d\'administrateur requis.', 'error')
         return redirect(url_for('dashboard'))
     
-    projects = Project.query.all()
-    all_time_entries = TimeEntry.query.order_by(TimeEntry.created_at.desc()).all()
-    users = User.query.all()
+    page = request.args.get('page', 1, type=int)
     
-    return render_template('admin.html', 
-                         projects=projects, 
-                         time_entries=all_time_entries,
-                         users=users)
+    # Listes relues en base : les modifications ont pu être faites par un autre worker
+    projects = get_all_projects(refresh=True)
+    entries_query = TimeEntry.query.options(
+        *eager_options(TimeEntry, joinedload(TimeEntry.project), joinedload(TimeEntry.user))
+    )
+    entries_pagination = entries_query.order_by(TimeEntry.created_at.desc()).paginate(
+        page=page, per_page=50, error_out=False, count=False
+    )
+    # Nombre d'entrées et total d'heures lus ensemble (sans cache) : les deux cartes
+    # restent cohérentes même après une modification traitée par un autre worker
+    entries_pagination.total, total_hours = db.session.query(
+        func.count(TimeEntry.id), func.coalesce(func.sum(TimeEntry.hours), 0)
+    ).one()
+    users = get_all_users(refresh=True)
+    
+    return stream_page('admin.html',
+                     projects=projects, 
+                     time_entries=entries_pagination.items,
+                     pagination=entries_pagination,
+                     total_hours=total_hours,
+                     users=users)
 
 @app.route('/admin/add_project', methods=['POST'])
 @login_required
@@ -254,6 +532,7 @@ def add_project():
         
         db.session.add(project)
         db.session.commit()
+        invalidate_reference_cache()
         flash(f'Projet "{name}" ajouté avec succès !', 'success')
         
     except Exception as e:
@@ -272,10 +551,12 @@ def remove_project(project_id):
         return redirect(url_for('dashboard'))
     
     try:
-        project = Project.query.get(project_id)
+        project = db.session.get(Project, project_id)
         if project:
             db.session.delete(project)
             db.session.commit()
+            invalidate_entry_counts()
+            invalidate_reference_cache()
             flash('Projet supprimé avec succès !', 'success')
         else:
             flash('Projet introuvable.', 'error')
@@ -295,7 +576,7 @@ def edit_project(project_id):
         flash('Accès refusé. Seuls les administrateurs peuvent modifier des projets.', 'error')
         return redirect(url_for('dashboard'))
     
-    project = Project.query.get_or_404(project_id)
+    project = db.get_or_404(Project, project_id)
     
     if request.method == 'POST':
         try:
@@ -309,7 +590,7 @@ def edit_project(project_id):
                 return render_template('edit_project.html', project=project)
             
             # Vérifier l'unicité du nom (sauf pour le projet actuel)
-            existing_project = Project.query.filter(
+            existing_project = db.session.query(Project.id).filter(
                 Project.name == name, 
                 Project.id != project_id
             ).first()
@@ -323,6 +604,7 @@ def edit_project(project_id):
             project.color = color
             
             db.session.commit()
+            invalidate_reference_cache()
             flash(f'Projet "{name}" modifié avec succès.', 'success')
             return redirect(url_for('admin'))
             
@@ -343,8 +625,8 @@ def manage_users():
         flash('Accès refusé. Privilèges d\'administrateur requis.', 'error')
         return redirect(url_for('dashboard'))
     
-    users = User.query.all()
-    return render_template('users.html', users=users)
+    users = get_all_users(refresh=True)
+    return conditional_response(render_template('users.html', users=users))
 
 @app.route('/admin/add_user', methods=['POST'])
 @login_required
@@ -363,19 +645,21 @@ def add_user():
             flash('Le nom d\'utilisateur et le mot de passe sont requis.', 'error')
             return redirect(url_for('manage_users'))
         
-        # Check if username already exists
-        existing_user = User.query.filter_by(username=username).first()
-        if existing_user:
+        # Insert unless the username already exists (single statement, no race)
+        user_id = db.session.execute(
+            upsert_insert(User).values(
+                username=username,
+                is_admin=is_admin,
+                password_hash=User.hash_password(password)
+            ).on_conflict_do_nothing(index_elements=['username']).returning(User.id)
+        ).scalar()
+        if user_id is None:
+            db.session.rollback()
             flash('Ce nom d\'utilisateur existe déjà.', 'error')
             return redirect(url_for('manage_users'))
         
-        user = User()
-        user.username = username
-        user.is_admin = is_admin
-        user.set_password(password)
-        
-        db.session.add(user)
         db.session.commit()
+        invalidate_reference_cache()
         flash(f'Utilisateur "{username}" ajouté avec succès !', 'success')
         
     except Exception as e:
@@ -394,7 +678,7 @@ def edit_user(user_id):
         return redirect(url_for('dashboard'))
     
     try:
-        user = User.query.get(user_id)
+        user = db.session.get(User, user_id)
         if not user:
             flash('Utilisateur introuvable.', 'error')
             return redirect(url_for('manage_users'))
@@ -408,7 +692,7 @@ def edit_user(user_id):
             return redirect(url_for('manage_users'))
         
         # Check if username already exists (except for current user)
-        existing_user = User.query.filter_by(username=username).first()
+        existing_user = get_user_by_username(username)
         if existing_user and existing_user.id != user.id:
             flash('Ce nom d\'utilisateur existe déjà.', 'error')
             return redirect(url_for('manage_users'))
@@ -420,6 +704,7 @@ def edit_user(user_id):
             user.set_password(password)
         
         db.session.commit()
+        invalidate_reference_cache()
         flash(f'Utilisateur "{username}" modifié avec succès !', 'success')
         
     except Exception as e:
@@ -438,7 +723,7 @@ def delete_user(user_id):
         return redirect(url_for('dashboard'))
     
     try:
-        user = User.query.get(user_id)
+        user = db.session.get(User, user_id)
         if not user:
             flash('Utilisateur introuvable.', 'error')
             return redirect(url_for('manage_users'))
@@ -450,6 +735,8 @@ def delete_user(user_id):
         
         db.session.delete(user)
         db.session.commit()
+        invalidate_entry_counts()
+        invalidate_reference_cache()
         flash(f'Utilisateur "{user.username}" supprimé avec succès !', 'success')
         
     except Exception as e:
@@ -464,7 +751,10 @@ def delete_user(user_id):
 def delete_entry(entry_id):
     """Supprimer une entrée de temps"""
     try:
-        entry = TimeEntry.query.get(entry_id)
+        entry = db.session.execute(
+            db.select(TimeEntry.user_id, TimeEntry.hours, Project.name.label('project_name'))
+            .join(Project).where(TimeEntry.id == entry_id)
+        ).first()
         if not entry:
             flash('Entrée introuvable.', 'error')
             return redirect(url_for('dashboard'))
@@ -477,11 +767,12 @@ def delete_entry(entry_id):
             return redirect(url_for('dashboard'))
         
         # Récupérer les infos avant suppression pour le message
-        project_name = entry.project.name
+        project_name = entry.project_name
         hours = entry.hours
         
-        db.session.delete(entry)
+        db.session.execute(db.delete(TimeEntry).where(TimeEntry.id == entry_id))
         db.session.commit()
+        invalidate_entry_counts()
         
         flash(f'Entrée supprimée : {hours}h sur {project_name}', 'success')
         
@@ -502,7 +793,7 @@ def delete_entry(entry_id):
 def edit_entry(entry_id):
     """Modifier une entrée de temps"""
     try:
-        entry = TimeEntry.query.get(entry_id)
+        entry = db.session.get(TimeEntry, entry_id)
         if not entry:
             flash('Entrée introuvable.', 'error')
             return redirect(url_for('dashboard'))
@@ -525,19 +816,19 @@ def edit_entry(entry_id):
             notes = request.form.get('notes', '')
             
             # Validation
-            if not project_id or hours <= 0 or not date_str:
+            if hours <= 0 or not date_str:
                 flash('Veuillez fournir un projet, des heures et une date valides.', 'error')
                 return redirect(url_for('edit_entry', entry_id=entry_id))
             
-            # Vérifier que le projet existe
-            project = Project.query.get(project_id)
-            if not project:
+            # Vérifier que le projet existe (nom seul, pour le message)
+            project_name = db.session.scalar(db.select(Project.name).filter_by(id=project_id))
+            if project_name is None:
                 flash('Projet sélectionné invalide.', 'error')
                 return redirect(url_for('edit_entry', entry_id=entry_id))
             
             # Parser la date
             try:
-                entry_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+                entry_date = date.fromisoformat(date_str)
             except ValueError:
                 flash('Format de date invalide.', 'error')
                 return redirect(url_for('edit_entry', entry_id=entry_id))
@@ -549,7 +840,8 @@ def edit_entry(entry_id):
             entry.notes = notes
             
             db.session.commit()
-            flash(f'Entrée modifiée avec succès : {hours}h sur {project.name}', 'success')
+            invalidate_entry_counts()
+            flash(f'Entrée modifiée avec succès : {hours}h sur {project_name}', 'success')
             
             # Rediriger vers la page d'origine
             referer = request.headers.get('Referer')
@@ -559,7 +851,7 @@ def edit_entry(entry_id):
                 return redirect(url_for('dashboard'))
         
         # GET - Afficher le formulaire d'édition
-        projects = Project.query.all()
+        projects = get_all_projects()
         return render_template('edit_entry.html', entry=entry, projects=projects)
         
     except Exception as e:
@@ -572,9 +864,6 @@ def edit_entry(entry_id):
 @login_required
 def my_entries():
     """Vue personnelle des entrées avec recherche et pagination"""
-    from datetime import datetime
-    from dateutil.relativedelta import relativedelta
-    
     # Récupérer les paramètres de recherche et pagination
     search_project = request.args.get('project', '')
     search_term = request.args.get('term', '')
@@ -593,77 +882,33 @@ def my_entries():
         query = query.filter(TimeEntry.notes.ilike(f'%{search_term}%'))
     
     # Pagination des entrées triées par date décroissante avec les détails du projet
-    entries_pagination = query.join(Project).order_by(TimeEntry.date.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
+    entries_pagination = query.options(
+        *eager_options(TimeEntry, selectinload(TimeEntry.project))
+    ).order_by(TimeEntry.date.desc()).paginate(
+        page=page, per_page=per_page, error_out=False, count=False
+    )
+    entries_pagination.total = cached_entry_count(
+        ('my_entries', current_user.id, search_project, search_term), query
     )
     entries = entries_pagination.items
     
     # Récupérer tous les projets pour le filtre
-    projects = Project.query.all()
+    projects = get_all_projects()
     
     # Calculer les statistiques pour les graphiques de l'utilisateur connecté
-    user_project_stats = db.session.query(
-        Project.name.label('project_name'),
-        func.sum(TimeEntry.hours).label('total_hours'),
-        func.count(TimeEntry.id).label('entry_count')
-    ).join(TimeEntry).filter(TimeEntry.user_id == current_user.id).group_by(Project.id, Project.name).all()
-    
-    # Données mensuelles pour l'utilisateur connecté (12 derniers mois)
-    user_monthly_labels = []
-    now = datetime.now()
-    for i in range(11, -1, -1):
-        month_date = now - relativedelta(months=i)
-        user_monthly_labels.append(f"{month_date.strftime('%m')}/{month_date.year}")
-    
-    # Récupérer les données mensuelles pour l'utilisateur connecté
-    user_monthly_stats = db.session.query(
-        Project.name.label('project_name'),
-        TimeEntry.month,
-        TimeEntry.year,
-        func.sum(TimeEntry.hours).label('total_hours')
-    ).join(TimeEntry).filter(TimeEntry.user_id == current_user.id).group_by(Project.name, TimeEntry.month, TimeEntry.year).all()
+    # (totaux par projet et heures des 12 derniers mois, en une seule requête)
+    user_months = month_range(date.today())
+    user_monthly_labels = [label for _, _, label in user_months]
+    user_project_stats = project_month_stats(user_months, TimeEntry.user_id == current_user.id)
     
-    # Organiser les données par projet pour les 12 derniers mois
-    user_monthly_data = {}
-    user_monthly_totals = [0] * 12
-    
-    for stat in user_project_stats:
-        user_monthly_data[stat.project_name] = [0] * 12
-    
-    # Remplir les données mensuelles avec les heures brutes
-    for stat in user_monthly_stats:
-        if stat.project_name in user_monthly_data:
-            try:
-                month_key = f"{stat.month:02d}/{stat.year}"
-                if month_key in user_monthly_labels:
-                    month_idx = user_monthly_labels.index(month_key)
-                    hours = float(stat.total_hours)
-                    user_monthly_data[stat.project_name][month_idx] = hours
-                    user_monthly_totals[month_idx] += hours
-            except (ValueError, TypeError):
-                continue
-    
-    # Convertir en pourcentages basés sur le total du mois
-    for project_name in user_monthly_data:
-        for month_idx in range(12):
-            if user_monthly_totals[month_idx] > 0:
-                project_hours = user_monthly_data[project_name][month_idx]
-                percentage = (project_hours / user_monthly_totals[month_idx]) * 100
-                user_monthly_data[project_name][month_idx] = round(percentage, 1)
-            else:
-                user_monthly_data[project_name][month_idx] = 0
+    # Répartition mensuelle (en %) par projet sur les 12 derniers mois
+    user_monthly_data = monthly_percentages(user_project_stats, user_months)
     
     # Préparer les données pour le graphique par projet avec couleurs
-    project_colors = {}
-    for stat in user_project_stats:
-        project = Project.query.filter_by(name=stat.project_name).first()
-        if project:
-            project_colors[stat.project_name] = project.color or '#2563EB'
-    
     user_project_data = {
         'projects': [stat.project_name for stat in user_project_stats],
         'hours': [float(stat.total_hours) for stat in user_project_stats],
-        'colors': [project_colors.get(stat.project_name, '#2563EB') for stat in user_project_stats]
+        'colors': [stat.project_color or '#2563EB' for stat in user_project_stats]
     }
     
     return render_template('my_entries.html', 
@@ -682,7 +927,7 @@ def my_entries():
 def add_my_entry():
     """Ajouter une nouvelle entrée depuis la vue personnelle"""
     try:
-        project_id = request.form.get('project_id')
+        project_id = request.form.get('project_id', type=int)
         hours = request.form.get('hours')
         month_year = request.form.get('month_year')
         notes = request.form.get('notes', '').strip()
@@ -692,9 +937,9 @@ def add_my_entry():
             flash('Le projet, les heures et le mois sont obligatoires.', 'error')
             return redirect(url_for('my_entries'))
         
-        # Validation du projet
-        project = Project.query.get(project_id)
-        if not project:
+        # Validation du projet (nom seul, pour le message)
+        project_name = db.session.scalar(db.select(Project.name).filter_by(id=project_id))
+        if project_name is None:
             flash('Projet invalide.', 'error')
             return redirect(url_for('my_entries'))
         
@@ -709,15 +954,11 @@ def add_my_entry():
             return redirect(url_for('my_entries'))
         
         # Parse month and year
-        try:
-            year_str, month_str = month_year.split('-')
-            year = int(year_str)
-            month = int(month_str)
-            if month < 1 or month > 12:
-                raise ValueError("Mois invalide")
-        except (ValueError, IndexError):
+        parsed = parse_month_year(month_year)
+        if parsed is None:
             flash('Format de mois invalide.', 'error')
             return redirect(url_for('my_entries'))
+        year, month = parsed
         
         # Créer l'entrée
         entry = TimeEntry()
@@ -731,10 +972,11 @@ def add_my_entry():
         
         db.session.add(entry)
         db.session.commit()
+        invalidate_entry_counts()
         
         # Success message with month display
         month_display = entry.get_display_month()
-        flash(f'Entrée ajoutée: {hours_float}h sur {project.name} ({month_display})', 'success')
+        flash(f'Entrée ajoutée: {hours_float}h sur {project_name} ({month_display})', 'success')
         
     except Exception as e:
         logger.error(f"Erreur lors de l'ajout de l'entrée: {str(e)}")
@@ -747,7 +989,7 @@ def add_my_entry():
 @login_required 
 def edit_my_entry(entry_id):
     """Éditer une entrée depuis la vue personnelle"""
-    entry = TimeEntry.query.get_or_404(entry_id)
+    entry = db.one_or_404(db.select(TimeEntry).options(joinedload(TimeEntry.project)).filter_by(id=entry_id))
     
     # Vérifier que l'utilisateur peut modifier cette entrée
     if entry.user_id != current_user.id and not current_user.is_admin:
@@ -756,7 +998,7 @@ def edit_my_entry(entry_id):
     
     if request.method == 'POST':
         try:
-            project_id = request.form.get('project_id')
+            project_id = request.form.get('project_id', type=int)
             hours = request.form.get('hours')
             month_year = request.form.get('month_year')
             notes = request.form.get('notes', '').strip()
@@ -766,9 +1008,8 @@ def edit_my_entry(entry_id):
                 flash('Le projet, les heures et le mois sont obligatoires.', 'error')
                 return redirect(url_for('edit_my_entry', entry_id=entry_id))
             
-            # Validation du projet
-            project = Project.query.get(project_id)
-            if not project:
+            # Validation du projet (identifiant seul)
+            if db.session.query(Project.id).filter_by(id=project_id).first() is None:
                 flash('Projet invalide.', 'error')
                 return redirect(url_for('edit_my_entry', entry_id=entry_id))
             
@@ -783,15 +1024,11 @@ def edit_my_entry(entry_id):
                 return redirect(url_for('edit_my_entry', entry_id=entry_id))
             
             # Parse month and year
-            try:
-                year_str, month_str = month_year.split('-')
-                year = int(year_str)
-                month = int(month_str)
-                if month < 1 or month > 12:
-                    raise ValueError("Mois invalide")
-            except (ValueError, IndexError):
+            parsed = parse_month_year(month_year)
+            if parsed is None:
                 flash('Format de mois invalide.', 'error')
                 return redirect(url_for('edit_my_entry', entry_id=entry_id))
+            year, month = parsed
             
             # Mettre à jour l'entrée
             entry.project_id = project_id
@@ -801,6 +1038,7 @@ def edit_my_entry(entry_id):
             entry.notes = notes
             
             db.session.commit()
+            invalidate_entry_counts()
             flash('Entrée modifiée avec succès !', 'success')
             return redirect(url_for('my_entries'))
             
@@ -811,7 +1049,7 @@ def edit_my_entry(entry_id):
             return redirect(url_for('edit_my_entry', entry_id=entry_id))
     
     # GET request - afficher le formulaire d'édition
-    projects = Project.query.all()
+    projects = get_all_projects()
     return render_template('edit_my_entry.html', entry=entry, projects=projects)
 
 @app.route('/my_entries/delete/<int:entry_id>', methods=['POST'])
@@ -819,18 +1057,25 @@ def edit_my_entry(entry_id):
 def delete_my_entry(entry_id):
     """Supprimer une entrée depuis la vue personnelle"""
     try:
-        entry = TimeEntry.query.get_or_404(entry_id)
+        entry = db.session.execute(
+            db.select(TimeEntry.user_id, TimeEntry.hours, Project.name.label('project_name'))
+            .join(Project).where(TimeEntry.id == entry_id)
+        ).first()
+        if not entry:
+            flash('Entrée introuvable.', 'error')
+            return redirect(url_for('my_entries'))
         
         # Vérifier que l'utilisateur peut supprimer cette entrée
         if entry.user_id != current_user.id and not current_user.is_admin:
             flash('Vous ne pouvez supprimer que vos propres entrées.', 'error')
             return redirect(url_for('my_entries'))
         
-        project_name = entry.project.name
+        project_name = entry.project_name
         hours = entry.hours
         
-        db.session.delete(entry)
+        db.session.execute(db.delete(TimeEntry).where(TimeEntry.id == entry_id))
         db.session.commit()
+        invalidate_entry_counts()
         flash(f'Entrée supprimée: {hours}h sur {project_name}', 'success')
         
     except Exception as e:
@@ -854,7 +1099,7 @@ def change_password():
             flash('Tous les champs sont obligatoires.', 'error')
             return redirect(url_for('change_password'))
         
-        if new_password != confirm_password:
+        if not passwords_match(new_password, confirm_password):
             flash('La confirmation du mot de passe ne correspond pas.', 'error')
             return redirect(url_for('change_password'))
         
@@ -862,14 +1107,18 @@ def change_password():
             flash('Le mot de passe doit contenir au moins 4 caractères.', 'error')
             return redirect(url_for('change_password'))
         
+        if not password_attempt_allowed(('change_password', current_user.id)):
+            flash('Trop de tentatives. Veuillez réessayer dans une minute.', 'error')
+            return redirect(url_for('change_password'))
+        
         # Vérifier le mot de passe actuel
-        if not check_password_hash(current_user.password_hash, current_password):
+        if not current_user.check_password(current_password):
             flash('Mot de passe actuel incorrect.', 'error')
             return redirect(url_for('change_password'))
         
         try:
             # Mettre à jour le mot de passe
-            current_user.password_hash = generate_password_hash(new_password)
+            current_user.set_password(new_password)
             db.session.commit()
             flash('Mot de passe modifié avec succès.', 'success')
             return redirect(url_for('dashboard'))
@@ -890,7 +1139,7 @@ def admin_change_user_password(user_id):
         return redirect(url_for('dashboard'))
     
     try:
-        user = User.query.get(user_id)
+        user = db.session.get(User, user_id)
         if not user:
             flash('Utilisateur introuvable.', 'error')
             return redirect(url_for('manage_users'))
@@ -903,7 +1152,7 @@ def admin_change_user_password(user_id):
             flash('Tous les champs sont obligatoires.', 'error')
             return redirect(url_for('manage_users'))
         
-        if new_password != confirm_password:
+        if not passwords_match(new_password, confirm_password):
             flash('La confirmation du mot de passe ne correspond pas.', 'error')
             return redirect(url_for('manage_users'))
         
@@ -911,8 +1160,19 @@ def admin_change_user_password(user_id):
             flash('Le mot de passe doit contenir au moins 4 caractères.', 'error')
             return redirect(url_for('manage_users'))
         
+        if not password_attempt_allowed(('admin_change_user_password', current_user.id)):
+            flash('Trop de tentatives. Veuillez réessayer dans une minute.', 'error')
+            return redirect(url_for('manage_users'))
+        
+        # Même mot de passe (double soumission) : une vérification, pas de nouveau hash
+        if user.check_password(new_password):
+            if db.session.is_modified(user):  # ancien hash converti en argon2
+                db.session.commit()
+            flash(f'Le mot de passe de {user.username} est inchangé.', 'info')
+            return redirect(url_for('manage_users'))
+        
         # Mettre à jour le mot de passe
-        user.password_hash = generate_password_hash(new_password)
+        user.set_password(new_password)
         db.session.commit()
         flash(f'Mot de passe de {user.username} modifié avec succès.', 'success')
         
@@ -964,145 +1224,44 @@ def view_entries():
             query = query.filter(TimeEntry.user_id == search_user)
         
         # Pagination des entrées filtrées avec détails
-        entries_pagination = query.join(Project).join(User).order_by(TimeEntry.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
+        entries_pagination = query.options(
+            *eager_options(TimeEntry, selectinload(TimeEntry.project), selectinload(TimeEntry.user))
+        ).order_by(TimeEntry.created_at.desc()).paginate(
+            page=page, per_page=per_page, error_out=False, count=False
+        )
+        entries_pagination.total = cached_entry_count(
+            ('entries', search_project, search_term, search_user), query
         )
         time_entries = entries_pagination.items
         
         # Récupérer tous les projets et utilisateurs pour les filtres
-        projects = Project.query.all()
-        users = User.query.all()
-        
-        # Stats basiques par projet
-        project_stats = db.session.query(
-            Project.name.label('project_name'),
-            func.sum(TimeEntry.hours).label('total_hours'),
-            func.count(TimeEntry.id).label('entry_count')
-        ).join(TimeEntry).group_by(Project.id, Project.name).all()
+        projects = get_all_projects()
+        users = get_all_users()
         
-        # Calculer les données pour les graphiques mensuels (12 derniers mois)
-        from datetime import datetime
-        from dateutil.relativedelta import relativedelta
-        
-        # Données pour les graphiques sur les 12 derniers mois
-        projects_monthly_data = {}
-        monthly_labels = []
+        # Les statistiques portent sur l'utilisateur filtré, sinon sur tout le monde
+        stats_filters = [TimeEntry.user_id == search_user] if search_user else []
         
-        # Créer les labels des 12 derniers mois
-        now = datetime.now()
-        for i in range(11, -1, -1):
-            month_date = now - relativedelta(months=i)
-            monthly_labels.append(f"{month_date.strftime('%m')}/{month_date.year}")
+        # Stats par projet et heures des 12 derniers mois, en une seule requête
+        months = month_range(date.today())
+        monthly_labels = [label for _, _, label in months]
+        project_stats = project_month_stats(months, *stats_filters)
         
-        # Récupérer les données mensuelles pour les graphiques
-        monthly_project_stats = db.session.query(
-            Project.name.label('project_name'),
-            TimeEntry.month,
-            TimeEntry.year,
-            func.sum(TimeEntry.hours).label('total_hours')
-        ).join(TimeEntry).group_by(Project.name, TimeEntry.month, TimeEntry.year).all()
-        
-        # Organiser les données par projet pour les 12 derniers mois
-        for stat in project_stats:
-            projects_monthly_data[stat.project_name] = [0] * 12
-        
-        # Calculer les totaux par mois pour calculer les pourcentages
-        monthly_totals = [0] * 12
-        
-        # Remplir les données mensuelles avec les heures brutes
-        for stat in monthly_project_stats:
-            if stat.project_name in projects_monthly_data:
-                try:
-                    # Calculer l'index du mois dans les 12 derniers mois
-                    month_key = f"{stat.month:02d}/{stat.year}"
-                    if month_key in monthly_labels:
-                        month_idx = monthly_labels.index(month_key)
-                        hours = float(stat.total_hours)
-                        projects_monthly_data[stat.project_name][month_idx] = hours
-                        monthly_totals[month_idx] += hours
-                except (ValueError, TypeError):
-                    continue
-        
-        # Convertir en pourcentages basés sur le total du mois
-        for project_name in projects_monthly_data:
-            for month_idx in range(12):
-                if monthly_totals[month_idx] > 0:
-                    # Calculer le pourcentage pour ce projet ce mois-ci
-                    project_hours = projects_monthly_data[project_name][month_idx]
-                    percentage = (project_hours / monthly_totals[month_idx]) * 100
-                    projects_monthly_data[project_name][month_idx] = round(percentage, 1)
-                else:
-                    projects_monthly_data[project_name][month_idx] = 0
-        
-        # Filtrer les graphiques par utilisateur si spécifié
-        if search_user:
-            # Filtrer project_stats pour l'utilisateur sélectionné
-            filtered_project_stats = db.session.query(
-                Project.name.label('project_name'),
-                func.sum(TimeEntry.hours).label('total_hours'),
-                func.count(TimeEntry.id).label('entry_count')
-            ).join(TimeEntry).filter(TimeEntry.user_id == search_user).group_by(Project.id, Project.name).all()
-            
-            # Recalculer les données mensuelles pour cet utilisateur
-            filtered_monthly_stats = db.session.query(
-                Project.name.label('project_name'),
-                TimeEntry.month,
-                TimeEntry.year,
-                func.sum(TimeEntry.hours).label('total_hours')
-            ).join(TimeEntry).filter(TimeEntry.user_id == search_user).group_by(Project.name, TimeEntry.month, TimeEntry.year).all()
-            
-            # Réinitialiser les données pour l'utilisateur filtré
-            filtered_monthly_data = {}
-            filtered_monthly_totals = [0] * 12
-            
-            for stat in filtered_project_stats:
-                filtered_monthly_data[stat.project_name] = [0] * 12
-            
-            # Remplir avec les données de l'utilisateur filtré
-            for stat in filtered_monthly_stats:
-                if stat.project_name in filtered_monthly_data:
-                    try:
-                        month_key = f"{stat.month:02d}/{stat.year}"
-                        if month_key in monthly_labels:
-                            month_idx = monthly_labels.index(month_key)
-                            hours = float(stat.total_hours)
-                            filtered_monthly_data[stat.project_name][month_idx] = hours
-                            filtered_monthly_totals[month_idx] += hours
-                    except (ValueError, TypeError):
-                        continue
-            
-            # Convertir en pourcentages pour l'utilisateur filtré
-            for project_name in filtered_monthly_data:
-                for month_idx in range(12):
-                    if filtered_monthly_totals[month_idx] > 0:
-                        project_hours = filtered_monthly_data[project_name][month_idx]
-                        percentage = (project_hours / filtered_monthly_totals[month_idx]) * 100
-                        filtered_monthly_data[project_name][month_idx] = round(percentage, 1)
-                    else:
-                        filtered_monthly_data[project_name][month_idx] = 0
-            
-            # Utiliser les données filtrées
-            project_stats = filtered_project_stats
-            projects_monthly_data = filtered_monthly_data
+        # Répartition mensuelle (en %) par projet sur les 12 derniers mois
+        projects_monthly_data = monthly_percentages(project_stats, months)
         
         # Utiliser la vraie pagination
         pagination = entries_pagination
         
-        # Préparer les couleurs des projets pour les graphiques
-        project_colors = {}
-        for stat in project_stats:
-            project = Project.query.filter_by(name=stat.project_name).first()
-            if project:
-                project_colors[stat.project_name] = project.color or '#2563EB'
-        
+        # Données du graphique par projet (la couleur vient de la requête de stats)
         chart_data = {
             'projects': [stat.project_name for stat in project_stats],
             'hours': [float(stat.total_hours) for stat in project_stats],
-            'colors': [project_colors.get(stat.project_name, '#2563EB') for stat in project_stats]
+            'colors': [stat.project_color or '#2563EB' for stat in project_stats]
         }
         
         logger.info("Avant render_template")
         
+        # Rendu complet (page paginée) : une erreur de template reste gérée ci-dessous
         return render_template('entries.html', 
                              project_stats=project_stats,
                              chart_data=chart_data,
@@ -1135,7 +1294,9 @@ def export_csv():
         term_filter = request.args.get('term', '')
         
         # Query de base
-        query = TimeEntry.query.join(Project).join(User)
+        query = TimeEntry.query.options(
+            *eager_options(TimeEntry, selectinload(TimeEntry.project), selectinload(TimeEntry.user))
+        )
         
         # Appliquer les filtres
         if project_filter:
@@ -1259,7 +1420,9 @@ def export_my_entries():
         term_filter = request.args.get('term', '')
         
         # Query de base pour les entrées de l'utilisateur connecté
-        query = TimeEntry.query.filter(TimeEntry.user_id == current_user.id).join(Project)
+        query = TimeEntry.query.filter(TimeEntry.user_id == current_user.id).options(
+            *eager_options(TimeEntry, selectinload(TimeEntry.project))
+        )
         
         # Appliquer les filtres
         if project_filter:
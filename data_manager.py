@@ -1,24 +1,46 @@
 import json
 import os
+import time
+import queue
+import atexit
 import logging
+import secrets
+import threading
 from datetime import datetime
-import uuid
+
+try:
+    import orjson
+except ImportError:  # orjson not installed: use the stdlib json module
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
 class DataManager:
     """Manage data storage in JSON files"""
     
-    def __init__(self):
+    # Seconds the user writer waits after a login so concurrent ones share one write
+    USER_FLUSH_DELAY = 0.5
+    
+    def __init__(self, pretty=False):
+        # pretty=True writes indented JSON (handy when inspecting files in development)
+        self.pretty = pretty
         self.projects_file = 'data/projects.json'
         self.time_entries_file = 'data/time_entries.json'
         self.users_file = 'data/users.json'
         
+        # Parsed file contents keyed by filename: (st_mtime_ns, data)
+        self._cache = {}
+        
         # Ensure data directory exists
         os.makedirs('data', exist_ok=True)
         
         # Initialize files if they don't exist
         self.initialize_files()
+        
+        # save_user() only queues the record; a single writer thread batches them
+        self._user_queue = queue.Queue()
+        threading.Thread(target=self._user_writer, name='data-manager-users', daemon=True).start()
+        atexit.register(self.flush_users)
     
     def initialize_files(self):
         """Initialize JSON files with default data if they don't exist"""
@@ -51,26 +73,48 @@ class DataManager:
             self.save_json(self.users_file, [])
     
     def load_json(self, filename):
-        """Load data from JSON file"""
+        """Load data from JSON file, reusing the parsed data while the file is unchanged"""
         try:
-            with open(filename, 'r') as f:
-                return json.load(f)
+            mtime_ns = os.stat(filename).st_mtime_ns
+            cached = self._cache.get(filename)
+            if cached and cached[0] == mtime_ns:
+                return cached[1]
+            if orjson:
+                with open(filename, 'rb') as f:
+                    data = orjson.loads(f.read())
+            else:
+                with open(filename, 'r') as f:
+                    data = json.load(f)
+            self._cache[filename] = (mtime_ns, data)
+            return data
         except (FileNotFoundError, json.JSONDecodeError) as e:
             logger.error(f"Error loading {filename}: {str(e)}")
             return []
     
     def save_json(self, filename, data):
-        """Save data to JSON file"""
+        """Save data to JSON file (atomically: readers never see a partial write)"""
+        tmp_filename = f"{filename}.tmp"
         try:
-            with open(filename, 'w') as f:
-                json.dump(data, f, indent=2, default=str)
+            if orjson:
+                with open(tmp_filename, 'wb') as f:
+                    f.write(orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2 if self.pretty else None))
+            else:
+                with open(tmp_filename, 'w') as f:
+                    if self.pretty:
+                        json.dump(data, f, indent=2, default=str)
+                    else:
+                        json.dump(data, f, separators=(',', ':'), default=str)
+            os.replace(tmp_filename, filename)
+            self._cache[filename] = (os.stat(filename).st_mtime_ns, data)
         except Exception as e:
+            # The caller may have mutated the cached list: reload from disk next time
+            self._cache.pop(filename, None)
             logger.error(f"Error saving {filename}: {str(e)}")
             raise
     
     def generate_id(self):
-        """Generate unique ID"""
-        return str(uuid.uuid4())
+        """Generate unique ID (64 random bits, 16 hex characters)"""
+        return secrets.token_hex(8)
     
     def get_projects(self):
         """Get all projects"""
@@ -115,25 +159,52 @@ class DataManager:
         self.save_json(self.time_entries_file, time_entries)
     
     def save_user(self, user_data):
-        """Save or update user data"""
-        users = self.load_json(self.users_file)
-        
-        # Check if user exists
-        user_email = user_data.get('email')
-        existing_user_index = next((i for i, u in enumerate(users) if u.get('email') == user_email), None)
-        
+        """Save or update user data (written in the background, see flush_users)"""
+        now = datetime.now().isoformat()
         user_record = {
-            'email': user_email,
+            'email': user_data.get('email'),
             'firstname': user_data.get('firstname', ''),
             'lastname': user_data.get('lastname', ''),
             'name': user_data.get('name', ''),
-            'last_login': datetime.now().isoformat()
+            'last_login': now
         }
+        self._user_queue.put((user_record, now))
+    
+    def flush_users(self):
+        """Block until every queued user record has been written"""
+        self._user_queue.join()
+    
+    def _user_writer(self):
+        """Write queued user records, coalescing the ones that arrive together"""
+        while True:
+            pending = [self._user_queue.get()]
+            time.sleep(self.USER_FLUSH_DELAY)
+            while True:
+                try:
+                    pending.append(self._user_queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write_users(pending)
+            except Exception:
+                # save_user has already returned: log here, and keep the writer alive
+                logger.exception("Failed to write %d queued user records", len(pending))
+            finally:
+                for _ in pending:
+                    self._user_queue.task_done()
+    
+    def _write_users(self, pending):
+        """Merge (user_record, created_at) pairs into the users file in one write"""
+        users = self.load_json(self.users_file)
+        index_by_email = {u.get('email'): i for i, u in enumerate(users)}
         
-        if existing_user_index is not None:
-            users[existing_user_index] = user_record
-        else:
-            user_record['created_at'] = datetime.now().isoformat()
-            users.append(user_record)
+        for user_record, created_at in pending:
+            existing_user_index = index_by_email.get(user_record['email'])
+            if existing_user_index is not None:
+                users[existing_user_index] = user_record
+            else:
+                user_record['created_at'] = created_at
+                index_by_email[user_record['email']] = len(users)
+                users.append(user_record)
         
         self.save_json(self.users_file, users)
@@ -6,13 +6,14 @@ This script verifies that the application is running correctly.
 
 import sys
 import requests
-import time
+
+HEALTH_URL = 'http://localhost:5000/healthz'
 
 def check_health():
     """Check if the application is healthy."""
     try:
-        # Try to connect to the main application
-        response = requests.get('http://localhost:5000/', timeout=10)
+        # HEAD on the lightweight health endpoint: no page render, no body
+        response = requests.head(HEALTH_URL, timeout=2)
         
         if response.status_code == 200:
             print("✓ Application is healthy")
@@ -35,9 +36,7 @@ def main():
     """Main health check function."""
     print("Checking Lagoon Time Tracker health...")
     
-    # Wait a bit for the application to start
-    time.sleep(2)
-    
+    # Startup grace is handled by the container's HEALTHCHECK --start-period
     if check_health():
         print("Health check passed!")
         sys.exit(0)
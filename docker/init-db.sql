@@ -6,6 +6,7 @@ SET timezone = 'UTC';
 
 -- Create extensions if needed
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+CREATE EXTENSION IF NOT EXISTS pg_trgm;  -- trigram index on time_entries.notes
 
 -- Grant necessary permissions
 GRANT ALL PRIVILEGES ON DATABASE lagoon_timetracker TO lagoon_user;
@@ -0,0 +1,26 @@
+"""Gunicorn configuration, loaded automatically from the working directory.
+
+Command-line flags (Dockerfile, .replit) take precedence over these values.
+The app mostly waits on PostgreSQL; the Docker image installs the gevent extra
+and sets GUNICORN_WORKER_CLASS=gevent so a slow query only blocks its own
+greenlet instead of a whole worker process. Other deployments keep sync workers
+unless they opt in the same way.
+"""
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+# Greenlets per gevent worker, capped at the SQLAlchemy pool (pool_size + max_overflow)
+# so concurrent requests do not queue on pool_timeout waiting for a connection
+worker_connections = int(os.environ.get(
+    "GUNICORN_WORKER_CONNECTIONS",
+    int(os.environ.get("DB_POOL_SIZE", 10)) + int(os.environ.get("DB_MAX_OVERFLOW", 20)),
+))
+
+
+def post_fork(server, worker):
+    """Make psycopg2 cooperative so database waits yield to other greenlets"""
+    if worker_class != "gevent":
+        return
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
@@ -1,4 +1,5 @@
-from app import app
+from app import app, init_database
 
 if __name__ == '__main__':
+    init_database(fast_hash=True)
     app.run(host='0.0.0.0', port=5000, debug=True)
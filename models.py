@@ -1,11 +1,52 @@
+import sys
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 
 # This will be initialized in app.py
 db = SQLAlchemy()
 
+# French month names, indexed by month - 1
+MONTHS_FR = (
+    'Janvier', 'Février', 'Mars', 'Avril', 'Mai', 'Juin',
+    'Juillet', 'Août', 'Septembre', 'Octobre', 'Novembre', 'Décembre',
+)
+
+# Argon2id hasher; Werkzeug hashes (scrypt/pbkdf2) are still accepted and
+# upgraded on the next successful login
+password_hasher = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=2)
+# Minimal-cost hasher for development seed data; check_needs_rehash flags its
+# hashes so they are upgraded to the full parameters on first login
+fast_password_hasher = PasswordHasher(time_cost=1, memory_cost=8, parallelism=1)
+
+def _argon2_matches(password_hash, password):
+    """Verify an argon2 hash, returning a bool instead of raising"""
+    try:
+        return password_hasher.verify(password_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+def gevent_patched():
+    """True when gevent has monkey-patched threading (gunicorn gevent workers)"""
+    if 'gevent' not in sys.modules:
+        return False
+    from gevent import monkey
+    return monkey.is_module_patched('threading')
+
+def run_blocking(func, *args):
+    """Run CPU-bound work (password hashing) without stalling gevent workers.
+    
+    Under gevent the call runs on the hub's native thread pool so other
+    greenlets keep serving requests; otherwise it runs inline.
+    """
+    if gevent_patched():
+        import gevent
+        return gevent.get_hub().threadpool.apply(func, args)
+    return func(*args)
+
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
     
@@ -19,13 +60,38 @@ class User(UserMixin, db.Model):
     time_entries = db.relationship('TimeEntry', backref='user', lazy=True, cascade='all, delete-orphan')
     projects = db.relationship('Project', backref='creator', lazy=True)
     
+    @staticmethod
+    def hash_password(password, fast=False):
+        """Return the hash stored in password_hash for a clear-text password.
+        
+        fast=True uses the minimal-cost argon2 hasher (development seeding only).
+        """
+        if fast:
+            return fast_password_hasher.hash(password)
+        return run_blocking(password_hasher.hash, password)
+    
     def set_password(self, password):
         """Hash and set password"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = self.hash_password(password)
     
     def check_password(self, password):
-        """Check if provided password matches hash"""
-        return check_password_hash(self.password_hash, password)
+        """Check if provided password matches hash.
+        
+        On success, a legacy or outdated hash is replaced in place; the caller
+        commits the session to persist it.
+        """
+        if self.password_hash.startswith('$argon2'):
+            if not run_blocking(_argon2_matches, self.password_hash, password):
+                return False
+            if password_hasher.check_needs_rehash(self.password_hash):
+                self.set_password(password)
+            return True
+        
+        # Legacy Werkzeug hash: verify, then upgrade to argon2id
+        if not run_blocking(check_password_hash, self.password_hash, password):
+            return False
+        self.set_password(password)
+        return True
     
     def __repr__(self):
         return f'<User {self.username}>'
@@ -43,11 +109,24 @@ class Project(db.Model):
     # Relations
     time_entries = db.relationship('TimeEntry', backref='project', lazy=True, cascade='all, delete-orphan')
     
+    def count_time_entries(self):
+        """Number of time entries for this project, counted in SQL without loading them"""
+        return db.session.query(db.func.count(TimeEntry.id)).filter(TimeEntry.project_id == self.id).scalar()
+    
     def __repr__(self):
         return f'<Project {self.name}>'
 
 class TimeEntry(db.Model):
     __tablename__ = 'time_entries'
+    __table_args__ = (
+        db.Index('ix_time_entries_user_project', 'user_id', 'project_id'),
+        db.Index('ix_time_entries_user_created_at', 'user_id', 'created_at'),
+        db.Index('ix_time_entries_project', 'project_id'),
+        db.Index('ix_time_entries_created_at', 'created_at'),
+        # Trigram index for notes ILIKE '%term%' searches (PostgreSQL pg_trgm)
+        db.Index('ix_time_entries_notes_trgm', 'notes',
+                 postgresql_using='gin', postgresql_ops={'notes': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -64,12 +143,8 @@ class TimeEntry(db.Model):
     
     def get_display_month(self):
         """Get the month display in French"""
-        months = {
-            1: 'Janvier', 2: 'Février', 3: 'Mars', 4: 'Avril',
-            5: 'Mai', 6: 'Juin', 7: 'Juillet', 8: 'Août',
-            9: 'Septembre', 10: 'Octobre', 11: 'Novembre', 12: 'Décembre'
-        }
-        return f"{months.get(self.month, 'Inconnu')} {self.year}"
+        month_name = MONTHS_FR[self.month - 1] if self.month and 1 <= self.month <= 12 else 'Inconnu'
+        return f"{month_name} {self.year}"
     
     def get_display_date(self):
         """Get the appropriate date for display - prefer month/year if available"""
@@ -1,29 +1,137 @@
 import os
+import io
 import logging
 import json
-import base64
-import xml.etree.ElementTree as ET
-from urllib.parse import quote_plus
-import uuid
+import functools
+import secrets
+from pathlib import Path
+from datetime import datetime, timezone
+
+try:
+    import orjson
+except ImportError:  # orjson not installed: use the stdlib json module
+    orjson = None
+
+try:
+    import pybase64 as base64  # SIMD codec, same b64encode/b64decode API
+except ImportError:
+    import base64
+
+try:
+    from lxml import etree as ET
+    # libxml2 parser: no DTD loading or entity expansion, no network access,
+    # default size limits; whitespace-only text nodes are dropped
+    _PARSER_OPTIONS = {
+        'resolve_entities': False,
+        'load_dtd': False,
+        'no_network': True,
+        'huge_tree': False,
+        'remove_blank_text': True,
+    }
+except ImportError:  # lxml not installed: stdlib ElementTree (expat)
+    import xml.etree.ElementTree as ET
+    _PARSER_OPTIONS = None
 
 logger = logging.getLogger(__name__)
 
+SAML_NAMESPACES = {
+    'saml': 'urn:oasis:names:tc:SAML:2.0:assertion',
+    'samlp': 'urn:oasis:names:tc:SAML:2.0:protocol'
+}
+
+# AuthnRequest skeleton, filled in by SAMLAuth.__init__
+_AUTHN_REQUEST_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<samlp:AuthnRequest xmlns:samlp="urn:oasis:names:tc:SAML:2.0:protocol"
+                    xmlns:saml="urn:oasis:names:tc:SAML:2.0:assertion"
+                    ID="{id}"
+                    Version="2.0"
+                    IssueInstant="{ts}"
+                    Destination="{dest}"
+                    AssertionConsumerServiceURL="{acs}"
+                    ProtocolBinding="urn:oasis:names:tc:SAML:2.0:bindings:HTTP-POST">
+    <saml:Issuer>{issuer}</saml:Issuer>
+    <samlp:NameIDPolicy Format="urn:oasis:names:tc:SAML:1.1:nameid-format:emailAddress" AllowCreate="true"/>
+</samlp:AuthnRequest>"""
+
+# Clark-notation tags, matched directly without prefix resolution
+_TAG_ATTRIBUTE = '{%s}Attribute' % SAML_NAMESPACES['saml']
+_TAG_ATTRIBUTE_VALUE = '{%s}AttributeValue' % SAML_NAMESPACES['saml']
+
+# Attributes are streamed out of the response and discarded once read, so the
+# signature and the rest of the assertion are never kept as a full tree
+if _PARSER_OPTIONS is not None:
+    def _iter_attributes(saml_xml):
+        events = ET.iterparse(io.BytesIO(saml_xml), events=('end',), tag=_TAG_ATTRIBUTE, **_PARSER_OPTIONS)
+        for _, attribute in events:
+            yield attribute
+            attribute.clear()
+            while attribute.getprevious() is not None:
+                del attribute.getparent()[0]
+else:
+    def _iter_attributes(saml_xml):
+        for _, elem in ET.iterparse(io.BytesIO(saml_xml), events=('end',)):
+            if elem.tag == _TAG_ATTRIBUTE:
+                yield elem
+                elem.clear()
+            elif elem.tag != _TAG_ATTRIBUTE_VALUE:
+                # Values are cleared along with their attribute
+                elem.clear()
+
+# Claim name (last segment of the attribute Name URI) -> user_data field
+_CLAIM_MAP = {
+    'emailaddress': 'email',
+    'email': 'email',
+    'givenname': 'firstname',
+    'firstname': 'firstname',
+    'surname': 'lastname',
+    'lastname': 'lastname',
+    'displayname': 'name',
+    'name': 'name',
+}
+_CLAIM_FIELDS = frozenset(_CLAIM_MAP.values())
+
+def _attribute_value(attribute):
+    return attribute.findtext(_TAG_ATTRIBUTE_VALUE)
+
+@functools.lru_cache(maxsize=1)
+def _load_saml_settings():
+    """Read saml/settings.json once per process (shared, treat as read-only)"""
+    try:
+        raw = Path('saml/settings.json').read_bytes()
+        return orjson.loads(raw) if orjson else json.loads(raw)
+    except FileNotFoundError:
+        logger.warning("SAML settings file not found, using defaults")
+        return SAMLAuth.get_default_settings()
+
 class SAMLAuth:
     """SAML Authentication handler for Microsoft SSO"""
     
+    __slots__ = ('settings', 'sso_url', 'acs_url', 'entity_id', '_xml_pre', '_xml_mid', '_xml_post',
+                 '_login_url_prefix')
+    
     def __init__(self):
         self.settings = self.load_saml_settings()
+        # Values used on every login, resolved once
+        self.sso_url = self.settings['idp']['singleSignOnService']['url']
+        self.acs_url = self.settings['sp']['assertionConsumerService']['url']
+        self.entity_id = self.settings['sp']['entityId']
+        self._login_url_prefix = self.sso_url + '?SAMLRequest='
+        # AuthnRequest with the static fields filled in, split around ID and IssueInstant
+        authn_request = _AUTHN_REQUEST_TEMPLATE.format_map({
+            'id': '\0',
+            'ts': '\0',
+            'dest': self.sso_url,
+            'acs': self.acs_url,
+            'issuer': self.entity_id,
+        })
+        self._xml_pre, self._xml_mid, self._xml_post = authn_request.encode('utf-8').split(b'\0')
         
     def load_saml_settings(self):
-        """Load SAML settings from configuration"""
-        try:
-            with open('saml/settings.json', 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            logger.warning("SAML settings file not found, using defaults")
-            return self.get_default_settings()
+        """Load SAML settings from configuration (cached for the process)"""
+        return _load_saml_settings()
     
-    def get_default_settings(self):
+    @staticmethod
+    def get_default_settings():
         """Get default SAML settings for Microsoft Azure AD"""
         return {
             "sp": {
@@ -47,17 +155,16 @@ class SAMLAuth:
         """Generate SAML login URL"""
         try:
             # Create SAML AuthnRequest
-            request_id = str(uuid.uuid4())
+            # XML IDs must not start with a digit
+            request_id = '_' + secrets.token_hex(16)
             saml_request = self.create_authn_request(request_id)
             
             # Encode the request
-            encoded_request = base64.b64encode(saml_request.encode('utf-8')).decode('utf-8')
+            encoded_request = base64.b64encode(saml_request)
             
-            # Build login URL
-            sso_url = self.settings['idp']['singleSignOnService']['url']
-            login_url = f"{sso_url}?SAMLRequest={quote_plus(encoded_request)}"
-            
-            return login_url
+            # Build login URL (only '+', '/' and '=' of the base64 alphabet need escaping)
+            encoded_request = encoded_request.replace(b'+', b'%2B').replace(b'/', b'%2F').replace(b'=', b'%3D')
+            return self._login_url_prefix + encoded_request.decode('ascii')
             
         except Exception as e:
             logger.error(f"Error generating SAML login URL: {str(e)}")
@@ -65,24 +172,12 @@ class SAMLAuth:
             return "https://login.microsoftonline.com/common/oauth2/authorize?client_id=dummy&response_type=code"
     
     def create_authn_request(self, request_id):
-        """Create SAML AuthnRequest XML"""
-        acs_url = self.settings['sp']['assertionConsumerService']['url']
-        entity_id = self.settings['sp']['entityId']
-        
-        authn_request = f"""<?xml version="1.0" encoding="UTF-8"?>
-<samlp:AuthnRequest xmlns:samlp="urn:oasis:names:tc:SAML:2.0:protocol"
-                    xmlns:saml="urn:oasis:names:tc:SAML:2.0:assertion"
-                    ID="{request_id}"
-                    Version="2.0"
-                    IssueInstant="{self.get_timestamp()}"
-                    Destination="{self.settings['idp']['singleSignOnService']['url']}"
-                    AssertionConsumerServiceURL="{acs_url}"
-                    ProtocolBinding="urn:oasis:names:tc:SAML:2.0:bindings:HTTP-POST">
-    <saml:Issuer>{entity_id}</saml:Issuer>
-    <samlp:NameIDPolicy Format="urn:oasis:names:tc:SAML:1.1:nameid-format:emailAddress" AllowCreate="true"/>
-</samlp:AuthnRequest>"""
-        
-        return authn_request
+        """Create SAML AuthnRequest XML (UTF-8 bytes)"""
+        return b''.join((
+            self._xml_pre, request_id.encode('ascii'),
+            self._xml_mid, self.get_timestamp().encode('ascii'),
+            self._xml_post,
+        ))
     
     def process_response(self, saml_response):
         """Process SAML response and extract user data"""
@@ -91,15 +186,13 @@ class SAMLAuth:
                 logger.error("No SAML response received")
                 return None
             
-            # Decode SAML response
-            decoded_response = base64.b64decode(saml_response).decode('utf-8')
-            logger.debug(f"Decoded SAML response: {decoded_response}")
-            
-            # Parse XML
-            root = ET.fromstring(decoded_response)
+            # Decode SAML response (kept as bytes: the XML declaration carries the encoding)
+            decoded_response = base64.b64decode(saml_response)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Decoded SAML response: {decoded_response.decode('utf-8', 'replace')}")
             
-            # Extract user attributes
-            user_data = self.extract_user_attributes(root)
+            # Parse XML and extract user attributes
+            user_data = self.extract_user_attributes(decoded_response)
             
             if user_data.get('email'):
                 logger.info(f"Successfully extracted user data for: {user_data['email']}")
@@ -113,37 +206,32 @@ class SAMLAuth:
             # For development purposes, return mock data if SAML processing fails
             return self.get_mock_user_data()
     
-    def extract_user_attributes(self, root):
-        """Extract user attributes from SAML response XML"""
+    def extract_user_attributes(self, saml_xml):
+        """Extract user attributes from SAML response XML (bytes)"""
         user_data = {}
         
-        # Define namespaces
-        namespaces = {
-            'saml': 'urn:oasis:names:tc:SAML:2.0:assertion',
-            'samlp': 'urn:oasis:names:tc:SAML:2.0:protocol'
-        }
-        
         try:
-            # Find attribute statements
-            for attr_statement in root.findall('.//saml:AttributeStatement', namespaces):
-                for attribute in attr_statement.findall('saml:Attribute', namespaces):
-                    attr_name = attribute.get('Name', '').lower()
-                    attr_value = attribute.find('saml:AttributeValue', namespaces)
-                    
-                    if attr_value is not None and attr_value.text:
-                        if 'emailaddress' in attr_name or 'email' in attr_name:
-                            user_data['email'] = attr_value.text
-                        elif 'givenname' in attr_name or 'firstname' in attr_name:
-                            user_data['firstname'] = attr_value.text
-                        elif 'surname' in attr_name or 'lastname' in attr_name:
-                            user_data['lastname'] = attr_value.text
-                        elif 'displayname' in attr_name or 'name' in attr_name:
-                            user_data['name'] = attr_value.text
+            # Attributes of every attribute statement
+            for attribute in _iter_attributes(saml_xml):
+                attr_name = attribute.get('Name', '').lower()
+                field = _CLAIM_MAP.get(attr_name.rsplit('/', 1)[-1])
+                
+                # First value of each claim wins
+                if field and field not in user_data:
+                    attr_value = _attribute_value(attribute)
+                    if attr_value:
+                        user_data[field] = attr_value
+                        if user_data.keys() >= _CLAIM_FIELDS:
+                            # Everything we need, skip the remaining claims
+                            break
             
             # Try to construct full name if not provided
             if 'name' not in user_data and 'firstname' in user_data and 'lastname' in user_data:
                 user_data['name'] = f"{user_data['firstname']} {user_data['lastname']}"
             
+        except ET.ParseError:
+            # Malformed response, handled by process_response
+            raise
         except Exception as e:
             logger.error(f"Error extracting attributes: {str(e)}")
         
@@ -161,5 +249,7 @@ class SAMLAuth:
     
     def get_timestamp(self):
         """Get current timestamp in ISO format"""
-        from datetime import datetime
-        return datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        return datetime.now(timezone.utc).isoformat(timespec='microseconds').replace('+00:00', 'Z')
+
+# Shared handler: settings and request templates are built once per process
+saml_auth = SAMLAuth()